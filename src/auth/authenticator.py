@@ -3,30 +3,100 @@
 import os
 import streamlit as st
 import yaml
-import hashlib
 import config
+# Re-exported so existing `from auth.authenticator import hash_password` imports keep working.
+from auth.passwords import hash_password, verify_password
+from auth.passwords import DUMMY_PASSWORD_HASH
 
 # Use the absolute path for the users file from the central config.
 USER_FILE = config.USERS_FILE
 
+# Prefer the libyaml-backed loader when PyYAML was built with it; same semantics as SafeLoader.
+Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+Dumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
 # --- Core Functions ---
 
-def load_users():
-    """Safely loads user data from the YAML file."""
+@st.cache_data(show_spinner=False, max_entries=1)
+def _load_users_cached(path, mtime, size):
+    """
+    Parses the users file. The file's mtime and size are part of the cache key,
+    so any edit on disk invalidates the cached result automatically.
+    st.cache_data hands every caller its own copy, so callers may mutate it freely.
+    """
+    # Use a safe loader for security.
+    with open(path, "r") as f:
+        return yaml.load(f, Loader=Loader) or {}
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _load_login_index_cached(path, mtime, size):
+    """
+    Builds a username -> (password, name, role, department) index for the login path.
+    It is shared across sessions without copying, so its tuples must stay read-only.
+    """
+    users = _load_users_cached(path, mtime, size)
+    return {
+        username: (
+            details.get("password"),
+            details.get("name", username),
+            details.get("role", "user"),
+            details.get("department", "general"),
+        )
+        for username, details in users.items()
+        # Skip malformed entries (e.g. a bare `name:` line) so they don't block every login.
+        if isinstance(details, dict)
+    }
+
+def _read_users_file(cached_loader):
+    """Calls a cached loader with the users file's (path, mtime, size) key, reporting any errors."""
     if not os.path.exists(USER_FILE):
         st.error(f"⚠️ {os.path.basename(USER_FILE)} file not found.")
         return {}
     try:
-        # Use yaml.safe_load for security.
-        with open(USER_FILE, "r") as f:
-            return yaml.safe_load(f)
+        stat = os.stat(USER_FILE)
+        return cached_loader(USER_FILE, stat.st_mtime, stat.st_size)
     except Exception as e:
         st.error(f"⚠️ Error reading {os.path.basename(USER_FILE)}: {e}")
         return {}
 
-def hash_password(password):
-    """Hashes a password using SHA256 for secure storage."""
-    return hashlib.sha256(password.encode()).hexdigest()
+def load_users():
+    """Safely loads user data from the YAML file, reusing the parsed result across reruns."""
+    return _read_users_file(_load_users_cached)
+
+def load_login_index():
+    """Safely loads the read-only login index built from the YAML file."""
+    return _read_users_file(_load_login_index_cached)
+
+def load_user(username):
+    """
+    Returns the (password, name, role, department) entry for a single user, or None.
+    Served from the cached login index, so it never re-parses users.yaml unless the file changed.
+    """
+    return load_login_index().get(username)
+
+def save_users(users_data):
+    """
+    Safely writes the provided user dictionary to the users.yaml file
+    and clears the cached copy used by load_users().
+
+    Args:
+        users_data (dict): The complete dictionary of users to save.
+
+    Returns:
+        bool: True if save was successful, False otherwise.
+    """
+    try:
+        # Serialize with the C dumper before opening the file, so a dump error never truncates it.
+        serialized = yaml.dump(users_data, Dumper=Dumper, default_flow_style=False)
+        with open(USER_FILE, "w") as f:
+            f.write(serialized)
+        return True
+    except Exception as e:
+        st.error(f"Failed to save users file: {e}")
+        return False
+    finally:
+        _load_users_cached.clear()
+        _load_login_index_cached.clear()
 
 # --- Streamlit UI and Session Management ---
 
@@ -44,24 +114,37 @@ def login_form():
     password = st.text_input("Password", type="password")
     
     if st.button("Login"):
-        # Load the latest user data ON CLICK to see newly created users immediately.
-        users = load_users()
+        # Look up the latest user data ON CLICK to see newly created users immediately.
+        entry = load_user(username)
         
-        if username in users:
-            # Hash the entered password and compare it to the stored hash.
-            hashed_pw = hash_password(password)
-            if users[username].get("password") == hashed_pw:
-                # --- Set Session State on Success ---
-                st.session_state.authenticated = True
-                st.session_state.username = users[username].get("name", username)
-                st.session_state.username_key = username # Unique key for internal use
-                st.session_state.role = users[username].get("role", "user")
-                st.session_state.department = users[username].get("department", "general")
-                
-                st.success("✅ Login successful")
-                st.rerun() # Rerun to show the main app.
-            else:
-                st.error("❌ Invalid username or password")
+        if entry:
+            stored_hash, name, role, department = entry
+            is_valid, needs_rehash = verify_password(stored_hash, password)
+        else:
+            # Do the same hashing work for unknown usernames so response time doesn't reveal them.
+            verify_password(DUMMY_PASSWORD_HASH, password)
+            is_valid = False
+        
+        if is_valid:
+            # Lazily migrate legacy (or outdated) hashes now that we know the plain password.
+            if needs_rehash:
+                users = load_users()
+                if username in users:
+                    users[username]["password"] = hash_password(password)
+                    save_users(users)
+
+            # --- Set Session State on Success ---
+            st.session_state.authenticated = True
+            st.session_state.username = name
+            st.session_state.username_key = username # Unique key for internal use
+            st.session_state.role = role
+            st.session_state.department = department
+            # Pre-build the role-specific UI strings once per login instead of on every rerun.
+            st.session_state.role_title = role.title()
+            st.session_state.responsibility_prompt = f"What are my responsibilities as a {st.session_state.role_title}?"
+            
+            st.success("✅ Login successful")
+            st.rerun() # Rerun to show the main app.
         else:
             st.error("❌ Invalid username or password")
 
@@ -87,7 +170,7 @@ def logout():
     Clears all session state keys to log the user out.
     Used as a button callback.
     """
-    keys_to_delete = ["authenticated", "username", "username_key", "role", "department", "messages"]
+    keys_to_delete = ["authenticated", "username", "username_key", "role", "department", "role_title", "responsibility_prompt", "vectorstore_warmed", "messages"]
     for key in keys_to_delete:
         if key in st.session_state:
             del st.session_state[key]
\ No newline at end of file
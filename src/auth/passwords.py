@@ -0,0 +1,52 @@
+# src/auth/passwords.py
+
+# Pure password helpers. This module deliberately does not import streamlit,
+# so scripts that only need to hash or verify passwords stay cheap to import.
+
+import hashlib
+import hmac
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+
+# Argon2id parameters: 3 passes over 64 MiB, single lane.
+_PASSWORD_HASHER = PasswordHasher(time_cost=3, memory_cost=64 * 1024, parallelism=1)
+ARGON2_PREFIX = "$argon2id$"
+# Hash of a throwaway password with the same parameters. Logins for unknown usernames and
+# legacy SHA256 accounts also verify against it, so every login costs one Argon2id verify.
+DUMMY_PASSWORD_HASH = "$argon2id$v=19$m=65536,t=3,p=1$OzjaOchB3XUEui4WnGi0gQ$LPlfuVmCXMp6jqu3mOIQusRfVJoi9umfhFnVF4cQ4PE"
+
+def hash_password(password):
+    """Hashes a password using Argon2id (salted, memory-hard) for secure storage."""
+    return _PASSWORD_HASHER.hash(password)
+
+def _legacy_hash_password(password):
+    """Unsalted SHA256 hash used by accounts created before the Argon2id migration."""
+    return hashlib.sha256(password.encode()).hexdigest()
+
+def verify_password(stored_hash, password):
+    """
+    Checks a password against a stored hash of either scheme.
+
+    Returns:
+        tuple: (is_valid, needs_rehash). Legacy SHA256 hashes always need a rehash.
+        Malformed stored values (e.g. a hand-edited users.yaml) never verify.
+    """
+    if not stored_hash or not isinstance(stored_hash, str):
+        return False, False
+    if stored_hash.startswith(ARGON2_PREFIX):
+        try:
+            _PASSWORD_HASHER.verify(stored_hash, password)
+        except (VerificationError, InvalidHashError):
+            return False, False
+        return True, _PASSWORD_HASHER.check_needs_rehash(stored_hash)
+    # Legacy rows are checked with a fast SHA256, so also pay for one Argon2id verify here:
+    # every login then costs the same, whether the username is unknown, legacy or migrated.
+    try:
+        _PASSWORD_HASHER.verify(DUMMY_PASSWORD_HASH, password)
+    except VerificationError:
+        pass
+    try:
+        return hmac.compare_digest(stored_hash, _legacy_hash_password(password)), True
+    except TypeError:
+        # compare_digest rejects non-ASCII str values.
+        return False, False
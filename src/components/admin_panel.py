@@ -3,40 +3,45 @@
 import os
 import shutil
 import json
+import orjson
 import streamlit as st
-import yaml
 import config
-from auth.authenticator import load_users, hash_password
+from auth.authenticator import load_users, save_users, hash_password
+from core.rag_engine import clear_vectorstore_cache
 
 # --- Core Helper Functions ---
 
+@st.cache_data(ttl=30, show_spinner=False)
 def _get_available_departments():
     """
     Scans the data directory and returns a list of all valid department folder names.
-    This ensures the UI always reflects the current folder structure.
+    The result is cached briefly and cleared after any document change, so the UI
+    still reflects the current folder structure without rescanning on every rerun.
     """
     if not os.path.exists(config.UPLOAD_DIR):
         return []
-    # List comprehension to get all items in UPLOAD_DIR that are directories
-    return [d for d in os.listdir(config.UPLOAD_DIR) if os.path.isdir(os.path.join(config.UPLOAD_DIR, d))]
+    # os.scandir reports the entry type from the directory listing, so no extra stat() per entry
+    with os.scandir(config.UPLOAD_DIR) as it:
+        return [e.name for e in it if e.is_dir()]
 
-def _save_users(users_data):
+@st.cache_data(show_spinner=False, max_entries=1)
+def _load_model_config_cached(path, mtime, size):
     """
-    Helper function to safely write the provided user dictionary to the users.yaml file.
-    
-    Args:
-        users_data (dict): The complete dictionary of users to save.
-    
-    Returns:
-        bool: True if save was successful, False otherwise.
+    Parses config.json. The file's mtime and size are part of the cache key,
+    so a tab switch only costs a stat() unless the file actually changed.
     """
-    try:
-        with open(config.USERS_FILE, "w") as f:
-            yaml.dump(users_data, f, default_flow_style=False)
-        return True
-    except Exception as e:
-        st.error(f"Failed to save users file: {e}")
-        return False
+    with open(path, 'rb') as f:
+        return orjson.loads(f.read())
+
+# Bounded: every save creates a new (mtime, size) key, so old versions must be evicted.
+@st.cache_data(show_spinner=False, max_entries=256)
+def _read_text(path, mtime, size):
+    """
+    Reads a knowledge document for the editor. Keyed on the file's mtime and size,
+    so an edited file is re-read while untouched files are served from the cache.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        return file.read()
 
 # --- UI Builder for Tab 1: AI Model Configuration ---
 
@@ -51,15 +56,15 @@ def _build_model_selector():
     
     # Try to load the currently saved model from config.json
     try:
-        with open(config.CONFIG_FILE, 'r') as f:
-            cfg = json.load(f)
+        stat = os.stat(config.CONFIG_FILE)
+        cfg = _load_model_config_cached(config.CONFIG_FILE, stat.st_mtime, stat.st_size)
         current_model = cfg.get("current_model", default_model)
-    except (FileNotFoundError, json.JSONDecodeError):
+    except (FileNotFoundError, orjson.JSONDecodeError):
         # If the file doesn't exist or is invalid, use the default
         current_model = default_model
 
     # Set the default index for the selectbox based on the loaded configuration
-    current_index = available_models.index(current_model) if current_model in available_models else 0
+    current_index = config.AVAILABLE_MODEL_INDEX.get(current_model, 0)
 
     selected_model = st.selectbox(
         "Select the Gemini model for the chatbot:",
@@ -73,6 +78,7 @@ def _build_model_selector():
         try:
             with open(config.CONFIG_FILE, 'w') as f:
                 json.dump({"current_model": selected_model}, f, indent=2)
+            _load_model_config_cached.clear()
             st.success(f"Model successfully set to: **{selected_model}**")
         except Exception as e:
             st.error(f"Failed to save configuration: {e}")
@@ -107,7 +113,7 @@ def _build_user_manager():
                 if username != current_admin_username and details.get('role') != 'admin':
                     if st.button("🗑️ Delete", key=f"delete_{username}", help=f"Delete user {username}"):
                         del users[username]
-                        if _save_users(users):
+                        if save_users(users):
                             st.success(f"User '{username}' deleted.")
                             st.rerun()
 
@@ -136,7 +142,7 @@ def _build_user_manager():
                         st.error("This username already exists.")
                     else:
                         current_users[new_username] = {"name": new_name, "password": hash_password(new_password), "role": "admin", "department": "it"}
-                        if _save_users(current_users):
+                        if save_users(current_users):
                             st.success(f"Admin user '{new_username}' created successfully!")
                             st.rerun()
         else:
@@ -145,7 +151,7 @@ def _build_user_manager():
             # Department selector is outside the form to allow dynamic role updates
             selected_dept = st.selectbox("Department", options=config.DEPARTMENTS, key="department_selector")
             # Get the roles for the currently selected department
-            available_roles = config.DEPARTMENT_ROLES.get(selected_dept, [])
+            available_roles = config.DEPARTMENT_ROLES.get(selected_dept, ())
             
             st.subheader("Step 2: Fill in Details")
             with st.form("new_dept_user_form", clear_on_submit=True):
@@ -168,7 +174,7 @@ def _build_user_manager():
                         st.error("This username already exists.")
                     else:
                         current_users[new_username] = {"name": new_name, "password": hash_password(new_password), "role": new_role, "department": selected_dept}
-                        if _save_users(current_users):
+                        if save_users(current_users):
                             st.success(f"User '{new_username}' created successfully!")
                             st.rerun()
 
@@ -186,13 +192,16 @@ def _build_document_manager(departments):
             folder_path = os.path.join(config.UPLOAD_DIR, dept)
             os.makedirs(folder_path, exist_ok=True)
 
-            files = [f for f in os.listdir(folder_path) if os.path.isfile(os.path.join(folder_path, f))]
-            if not files:
+            # Keep the DirEntry objects so each file's path and stat() are reused below
+            with os.scandir(folder_path) as it:
+                entries = [e for e in it if e.is_file()]
+            if not entries:
                 st.write("No documents found in this department.")
             
             # Loop through each file to create its management widgets
-            for f in files:
-                file_path = os.path.join(folder_path, f)
+            for entry in entries:
+                f = entry.name
+                file_path = entry.path
                 col1, col2 = st.columns([4, 1])
                 with col1:
                     st.write(f"- {f}")
@@ -200,11 +209,12 @@ def _build_document_manager(departments):
                     # Delete button for the file
                     if st.button("🗑️", key=f"delete_{dept}_{f}", help=f"Delete {f}"):
                         os.remove(file_path)
+                        _get_available_departments.clear()
                         st.rerun()
                 # Expander to view and edit file content
                 with st.expander("📄 View / Edit"):
-                    with open(file_path, "r", encoding="utf-8") as file:
-                        content = file.read()
+                    stat = entry.stat()
+                    content = _read_text(file_path, stat.st_mtime, stat.st_size)
                     updated_content = st.text_area("Edit content:", value=content, key=f"edit_{dept}_{f}", height=200)
                     if st.button("💾 Save Changes", key=f"save_{dept}_{f}"):
                         with open(file_path, "w", encoding="utf-8") as file:
@@ -217,8 +227,10 @@ def _build_document_manager(departments):
             st.markdown("#### 📤 Upload New File")
             uploaded_file = st.file_uploader(f"Upload a .txt file for {dept}", type="txt", key=f"upload_{dept}")
             if uploaded_file:
+                # UploadedFile is already held in memory; getbuffer() writes it out without a copy
                 with open(os.path.join(folder_path, uploaded_file.name), "wb") as f:
                     f.write(uploaded_file.getbuffer())
+                _get_available_departments.clear()
                 st.success(f"Uploaded: {uploaded_file.name}")
                 st.rerun()
 
@@ -227,6 +239,7 @@ def _build_document_manager(departments):
             st.markdown("#### ✨ Update AI Knowledge Base")
             if st.button("🔄 Update Knowledge Base", key=f"reindex_{dept}"):
                 _handle_reindexing(dept)
+                _get_available_departments.clear()
 
 def _handle_reindexing(dept):
     """
@@ -243,23 +256,27 @@ def _handle_reindexing(dept):
         spinner_message = f"Updating knowledge base for {dept}..."
         success_message = f"Knowledge base for {dept} has been updated."
 
+    # Drop the in-memory copies first, so the chatbot stops answering from the old index
+    # even if the files below are already gone or cannot be removed.
+    clear_vectorstore_cache(None if dept == "general" else dept)
+
     with st.spinner(spinner_message):
         if not os.path.exists(path_to_clear):
             st.info(f"Knowledge base for '{dept}' does not exist yet. It will be built on the next query.")
             return
 
-        # Safely remove all files and subdirectories within the target path
-        for root, dirs, files in os.walk(path_to_clear, topdown=False):
-            for name in files:
-                try:
-                    os.remove(os.path.join(root, name))
-                except OSError as e:
-                    st.error(f"Error removing file {name}: {e}")
-            for name in dirs:
-                try:
-                    shutil.rmtree(os.path.join(root, name))
-                except OSError as e:
-                    st.error(f"Error removing subdirectory {name}: {e}")
+        # Remove everything inside the target directory but keep the directory itself:
+        # it may be a mount point (docker-compose bind-mounts the vector store root).
+        try:
+            with os.scandir(path_to_clear) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        shutil.rmtree(entry.path)
+                    else:
+                        os.unlink(entry.path)
+        except OSError as e:
+            st.error(f"Error clearing knowledge base at {path_to_clear}: {e}")
+            return
     
     st.success(success_message)
         
@@ -4,7 +4,7 @@ import streamlit as st
 from datetime import datetime
 
 # Correctly import from the new package structure
-from core.rag_engine import get_answer_from_rag
+from core.rag_engine import stream_answer_from_rag
 
 def show_chat_ui(timezone):
     """
@@ -34,8 +34,8 @@ def show_chat_ui(timezone):
     # --- THIS IS THE UPDATED SAMPLE PROMPTS LOGIC ---
     clicked_prompt = None
 
-    # Get the user's role from the session state to create a dynamic prompt
-    user_role = st.session_state.get("role", "employee").title()
+    # The role-specific prompt is built once at login (see auth.authenticator.login_form)
+    responsibility_prompt = st.session_state.get("responsibility_prompt", "What are my responsibilities?")
 
     col1, col2, col3 = st.columns(3)
     with col1:
@@ -46,8 +46,8 @@ def show_chat_ui(timezone):
             clicked_prompt = "How do I request vacation time?"
     with col3:
         # This is your new dynamic button, using the user's specific role
-        if st.button(f"What are my responsibilities as a {user_role}?"):
-            clicked_prompt = f"What are my responsibilities as a {user_role}?"
+        if st.button(responsibility_prompt):
+            clicked_prompt = responsibility_prompt
 
     # --- The rest of your chat logic remains exactly the same ---
     input_prompt = st.chat_input(f"Or type your question...")
@@ -59,37 +59,29 @@ def show_chat_ui(timezone):
             "content": prompt_to_process,
             "timestamp": datetime.now(timezone)
         })
-        st.rerun()
+        # Render the new message right away and answer it in this same pass,
+        # so each prompt costs a single rerun instead of two.
+        with st.chat_message("user"):
+            st.markdown(prompt_to_process)
 
-    # Generate assistant's response if the last message was from the user
-    if st.session_state.messages and st.session_state.messages[-1]["role"] == "user":
-        last_user_message = st.session_state.messages[-1]["content"]
-        
         # Get the user's role and department from the session state
         user_department = st.session_state.get("department", "general")
         user_role = st.session_state.get("role", "employee")
         
-        with st.spinner("Searching documents and crafting a response..."):
-            response_data = get_answer_from_rag(user_department, last_user_message, user_role)
-            
-            assistant_message = {
-                "role": "assistant",
-                "timestamp": datetime.now(timezone)
-            }
+        with st.chat_message("assistant"):
+            # The spinner only covers loading the knowledge base and building the chain, not the stream.
+            with st.spinner("Searching documents and crafting a response..."):
+                chunks, source_documents = stream_answer_from_rag(user_department, prompt_to_process, user_role)
+            # Render tokens as they arrive; write_stream returns the full answer text.
+            answer = st.write_stream(chunks)
 
-            if isinstance(response_data, dict):
-                assistant_message["content"] = response_data.get("result", "Sorry, I couldn't formulate an answer.")
-                source_documents = response_data.get("source_documents", [])
-                unique_source_names = []
-                if source_documents:
-                    for doc in source_documents:
-                        source_name = doc.metadata.get('source', 'Unknown Source')
-                        if source_name not in unique_source_names:
-                            unique_source_names.append(source_name)
-                assistant_message["sources"] = unique_source_names
-            else:
-                assistant_message["content"] = response_data
-                assistant_message["sources"] = []
-
-            st.session_state.messages.append(assistant_message)
-            st.rerun()
\ No newline at end of file
+        st.session_state.messages.append({
+            "role": "assistant",
+            "content": answer or "Sorry, I couldn't formulate an answer.",
+            "timestamp": datetime.now(timezone),
+            # dict.fromkeys de-duplicates in one pass while keeping first-seen order
+            "sources": list(dict.fromkeys(
+                doc.metadata.get('source', 'Unknown Source') for doc in source_documents
+            ))
+        })
+        st.rerun()
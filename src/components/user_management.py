@@ -1,19 +1,9 @@
 # src/components/user_management.py
 
 import streamlit as st
-import yaml
 import os
 import config
-from auth.authenticator import load_users, hash_password
-
-def _save_users(users_data):
-    try:
-        with open(config.USERS_FILE, "w") as f:
-            yaml.dump(users_data, f, default_flow_style=False)
-        return True
-    except Exception as e:
-        st.error(f"Failed to save users file: {e}")
-        return False
+from auth.authenticator import load_users, save_users, hash_password
 
 def show_user_management():
     """Builds the complete UI for managing users."""
@@ -39,7 +29,7 @@ def show_user_management():
                 if username != current_admin_username and details.get('role') != 'admin':
                     if st.button("🗑️ Delete", key=f"delete_{username}", help=f"Delete user {username}"):
                         del users[username]
-                        if _save_users(users):
+                        if save_users(users):
                             st.success(f"User '{username}' deleted.")
                             st.rerun()
 
@@ -61,8 +51,8 @@ def show_user_management():
         
         with st.form("new_user_form", clear_on_submit=True):
             
-            available_roles = config.DEPARTMENT_ROLES.get(selected_dept, [])
-            role_options = ["admin"] + available_roles
+            available_roles = config.DEPARTMENT_ROLES.get(selected_dept, ())
+            role_options = ("admin", *available_roles)
 
             new_username = st.text_input("Username (must be unique)")
             new_name = st.text_input("Full Name")
@@ -90,6 +80,6 @@ def show_user_management():
                         "role": new_role,
                         "department": final_department
                     }
-                    if _save_users(users):
+                    if save_users(users):
                         st.success(f"User '{new_username}' created successfully!")
                         # We don't need to rerun here, the form clear_on_submit handles it
\ No newline at end of file
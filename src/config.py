@@ -10,6 +10,7 @@ PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir
 # Define all other paths relative to the project root
 UPLOAD_DIR = os.path.join(PROJECT_ROOT, "data")
 VECTOR_DIR = os.path.join(PROJECT_ROOT, "vectorstore")
+EMBEDDING_CACHE_DIR = os.path.join(PROJECT_ROOT, "embedding_cache")
 CONFIG_FILE = os.path.join(PROJECT_ROOT, "config.json")
 USERS_FILE = os.path.join(PROJECT_ROOT, "users.yaml")
 ASSETS_DIR = os.path.join(PROJECT_ROOT, "assets")
@@ -18,40 +19,43 @@ LOGO_PATH = os.path.join(ASSETS_DIR, "logo.svg")
 PAGE_TITLE="Employee Knowledge Base Chatbot"
 DEFAULT_MODEL = "gemini-2.5-flash-lite"
 AVAILABLE_MODELS = ["gemini-2.5-flash", "gemini-2.5-flash-lite", "gemini-2.5-pro"]
+# Position of each model in AVAILABLE_MODELS, for selectbox defaults without a list scan
+AVAILABLE_MODEL_INDEX = {model: i for i, model in enumerate(AVAILABLE_MODELS)}
 
+# Role lists are tuples so they stay immutable and hash cheaply as widget options
 DEPARTMENT_ROLES = {
-    "finance": [
+    "finance": (
         "Junior Accountant",
         "AP/AR Officer",
         "Finance Analyst",
         "Finance Manager",
         "Treasury Officer"
-    ],
-    "marketing": [
+    ),
+    "marketing": (
         "Marketing Associate",
         "Digital Content Specialist",
         "Campaign Manager",
         "Marketing Lead"
-    ],
-    "production": [
+    ),
+    "production": (
         "Production Operator",
         "Quality Control Inspector",
         "Maintenance Technician",
         "Production Supervisor"
-    ],
-    "warehouse": [
+    ),
+    "warehouse": (
         "Warehouse Operator",
         "Inventory Clerk",
         "Logistics Coordinator",
         "Warehouse Supervisor"
-    ],
-    "it": [
+    ),
+    "it": (
         "IT Support Specialist",
         "Junior IT Support",
-    ]
+    )
 }
 
-DEPARTMENTS = list(DEPARTMENT_ROLES.keys())
+DEPARTMENTS = tuple(DEPARTMENT_ROLES.keys())
 
 
 
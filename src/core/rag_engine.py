@@ -2,18 +2,34 @@
 
 import os
 import logging
-import json
+import functools
+import hashlib
+import math
+import mmap
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from dotenv import load_dotenv
 
+import orjson
+import faiss
+import numpy as np
+
 from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
 from langchain.prompts import PromptTemplate
 from langchain_community.vectorstores import FAISS
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.chains import RetrievalQA
 from langchain.docstore.document import Document
+from langchain.embeddings import CacheBackedEmbeddings
+from langchain.storage import LocalFileStore
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain.chains import create_retrieval_chain
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.embeddings import Embeddings
 
 import config
 
@@ -23,6 +39,7 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 
 UPLOAD_DIR = config.UPLOAD_DIR
 VECTOR_DIR = config.VECTOR_DIR
+EMBEDDING_CACHE_DIR = config.EMBEDDING_CACHE_DIR
 
 # --- Initial API Key Validation ---
 if not os.getenv("GOOGLE_API_KEY"):
@@ -30,45 +47,249 @@ if not os.getenv("GOOGLE_API_KEY"):
 
 os.makedirs(VECTOR_DIR, exist_ok=True)
 
+EMBEDDING_MODEL = "models/text-embedding-004"
+# Maximum number of texts per batch embedding request accepted by the embedding API.
+EMBED_BATCH_SIZE = 100
+# File reads are I/O-bound (the GIL is released during read), so a small pool overlaps them.
+FILE_READ_WORKERS = 16
+# Files at least this large are memory-mapped instead of read through a buffered reader.
+MMAP_THRESHOLD_BYTES = 64 * 1024
+
+# --- Chunking Configuration ---
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 100
+# Chunks shorter than this are folded into the previous chunk of the same document...
+MIN_CHUNK_SIZE = 200
+# ...as long as the merged chunk stays within this length.
+MAX_CHUNK_SIZE = CHUNK_SIZE + CHUNK_OVERLAP
+CHUNK_SEPARATORS = ["\n\n", "\n", ". ", " ", ""]
+
+# --- Retrieval Configuration ---
+RETRIEVER_K = 3
+RETRIEVER_FETCH_K = 10
+RETRIEVER_LAMBDA_MULT = 0.5
+
+NO_DOCUMENTS_MESSAGE = "Sorry, I couldn't find any documents for this department..."
+TECHNICAL_ISSUE_MESSAGE = "Sorry, it seems there's a technical issue. Please try again later."
+
+# Built once at import time rather than re-parsed on every question.
+_PROMPT = ChatPromptTemplate.from_template(
+    """
+    You are a friendly and helpful onboarding assistant for the company "DummyWorX".
+    Your goal is to provide accurate, personalized, and conversational answers.
+
+    **IMPORTANT CONTEXT ABOUT THE USER ASKING THE QUESTION:**
+    - User's Role: {user_role}
+    - User's Department: {department}
+
+    Use the following pieces of retrieved context from the knowledge base to answer the user's question.
+
+    CONTEXT:
+    {context}
+
+    QUESTION:
+    {input}
+
+    INSTRUCTIONS:
+    - Answer the question from the perspective of the user's specific role.
+    - If the answer is in the context, provide it directly and confidently.
+    - If not, politely say you don't have information on that topic for their role and suggest they contact their manager.
+    - Always maintain a friendly, helpful, and professional tone.
+
+    FRIENDLY ANSWER:
+    """
+)
+
+# --- FAISS Index Configuration ---
+# IVF needs ~39 training vectors per list; below 64 lists' worth, an HNSW graph (no training) is used.
+IVF_MIN_VECTORS = 64 * 39
+# PQ trains 256 centroids per sub-quantizer, so it needs ~39 * 256 vectors before it pays off.
+PQ_MIN_VECTORS = 256 * 39
+# 48 sub-quantizers of 1 byte each: 48 bytes per vector instead of 3072 for 768-dim fp32.
+PQ_SUBQUANTIZERS = 48
+IVF_NPROBE = 8
+HNSW_EF_SEARCH = 64
+
+# Vector stores already loaded into memory, keyed by department and shared across sessions.
+_VECTORSTORE_CACHE = {}
+# One lock per department, so a slow build for one department never blocks queries for another.
+_VECTORSTORE_LOCKS = {}
+# Last model read from config.json: ((mtime, size), model).
+_MODEL_CONFIG_CACHE = None
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embeddings client with in-memory LRU caches, so a repeated question or an
+    already-seen chunk never costs another embedding API round-trip.
+    Vectors are held as read-only float32 arrays (3 KB per 768-dim vector, versus ~25 KB
+    as a tuple of Python floats); FAISS stores float32, so no precision is lost downstream.
+    """
+
+    def __init__(self, underlying, maxsize=2048):
+        self.underlying = underlying
+        self.maxsize = maxsize
+        self._embed_query_cached = functools.lru_cache(maxsize=maxsize)(self._embed_query_uncached)
+        self._document_cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _to_cached_vector(vector):
+        array = np.asarray(vector, dtype=np.float32)
+        array.flags.writeable = False
+        return array
+
+    def _embed_query_uncached(self, text):
+        return self._to_cached_vector(self.underlying.embed_query(text))
+
+    def embed_query(self, text):
+        return self._embed_query_cached(text).tolist()
+
+    def embed_documents(self, texts):
+        """Looks up each text individually and sends only the cache misses, as one batch."""
+        found = {}
+        with self._lock:
+            for text in texts:
+                if text in self._document_cache:
+                    self._document_cache.move_to_end(text)
+                    found[text] = self._document_cache[text]
+
+        misses = [text for text in dict.fromkeys(texts) if text not in found]
+        if misses:
+            vectors = self.underlying.embed_documents(misses)
+            with self._lock:
+                for text, vector in zip(misses, vectors):
+                    found[text] = self._document_cache[text] = self._to_cached_vector(vector)
+                while len(self._document_cache) > self.maxsize:
+                    self._document_cache.popitem(last=False)
+
+        return [found[text].tolist() for text in texts]
+
+def _make_embedding_cache_key_encoder(namespace):
+    """
+    Builds the key encoder for the on-disk embedding cache: the SHA-256 of the chunk text
+    with whitespace collapsed, so re-wrapped but otherwise unchanged chunks still hit the cache.
+    """
+    def encode(text):
+        normalized = " ".join(text.split())
+        return f"{namespace}/{hashlib.sha256(normalized.encode('utf-8')).hexdigest()}"
+    return encode
+
+@functools.lru_cache(maxsize=1)
+def _get_embedding_client(model_name=EMBEDDING_MODEL):
+    """
+    Returns a shared embeddings client, so the API channel is set up only once.
+    Chunk embeddings are persisted under EMBEDDING_CACHE_DIR, so rebuilding an index
+    only sends new or changed chunks to the API; an in-memory layer sits on top.
+    """
+    disk_cached = CacheBackedEmbeddings.from_bytes_store(
+        GoogleGenerativeAIEmbeddings(model=model_name),
+        LocalFileStore(EMBEDDING_CACHE_DIR),
+        key_encoder=_make_embedding_cache_key_encoder(model_name),
+    )
+    return CachedEmbeddings(disk_cached)
+
+@functools.lru_cache(maxsize=8)
+def _get_llm(model_name, temperature):
+    """Returns a shared chat model client for the given model and temperature."""
+    return ChatGoogleGenerativeAI(model=model_name, temperature=temperature)
+
+@functools.lru_cache(maxsize=8)
+def _get_question_answer_chain(model_name):
+    """Returns the shared "stuff" chain (prompt + LLM) for a model, wired up only once."""
+    return create_stuff_documents_chain(_get_llm(model_name, 0.2), _PROMPT)
+
+def clear_vectorstore_cache(dept=None):
+    """
+    Drops in-memory vector stores so the next query reloads them from disk.
+    Clears every department when no department is given.
+    """
+    if dept is None:
+        _VECTORSTORE_CACHE.clear()
+    else:
+        _VECTORSTORE_CACHE.pop(dept, None)
+
 def get_current_model_from_config():
-    """Reads the selected model from config.json, with a fallback default."""
-    config_path = "config.json"
+    """
+    Reads the selected model from config.json, with a fallback default.
+    The parsed value is cached and only re-read when the file's mtime or size changes.
+    """
+    global _MODEL_CONFIG_CACHE
+    config_path = config.CONFIG_FILE
     default_model = "gemini-2.5-flash"
     
-    if not os.path.exists(config_path):
+    try:
+        stat = os.stat(config_path)
+    except FileNotFoundError:
         logging.warning(f"{config_path} not found. Using default model: {default_model}")
         return default_model
+
+    cache_key = (stat.st_mtime, stat.st_size)
+    if _MODEL_CONFIG_CACHE and _MODEL_CONFIG_CACHE[0] == cache_key:
+        return _MODEL_CONFIG_CACHE[1]
     
     try:
-        with open(config_path, 'r') as f:
-            config = json.load(f)
-            model = config.get("current_model", default_model)
-            logging.info(f"Using configured model: {model}")
-            return model
-    except (json.JSONDecodeError, KeyError) as e:
+        with open(config_path, 'rb') as f:
+            cfg = orjson.loads(f.read())
+        model = cfg.get("current_model", default_model)
+        logging.info(f"Using configured model: {model}")
+    except (orjson.JSONDecodeError, KeyError) as e:
         logging.error(f"Error reading {config_path}: {e}. Using default model: {default_model}")
         return default_model
 
+    _MODEL_CONFIG_CACHE = (cache_key, model)
+    return model
+
+def _read_text_file(entry):
+    """
+    Reads a UTF-8 text file. Small files use Path.read_text; large ones are memory-mapped
+    and decoded straight from the mapping, so the decoded str is the only private copy.
+    """
+    if entry.stat().st_size < MMAP_THRESHOLD_BYTES:
+        return Path(entry.path).read_text(encoding="utf-8")
+
+    fd = os.open(entry.path, os.O_RDONLY)
+    try:
+        with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+            content = str(view, "utf-8")
+    finally:
+        os.close(fd)
+    # Match text-mode reads (universal newlines); skip the extra copy when there is nothing to translate.
+    if "\r" in content:
+        content = content.replace("\r\n", "\n").replace("\r", "\n")
+    return content
+
+def _read_doc(entry, folder_name):
+    """
+    Reads a single file into a Document, or returns None if it cannot be read.
+    """
+    try:
+        content = _read_text_file(entry)
+        metadata = {"source": os.path.join(folder_name, entry.name)}
+        return Document(page_content=content, metadata=metadata)
+    except Exception as e:
+        logging.error(f"Failed to read file {entry.path}: {e}")
+        return None
+
 def _load_docs_from_folder(folder_path):
     """
     A safe helper function to load documents from a single folder.
+    Files are read concurrently on a thread pool; the result keeps directory order.
     """
-    docs = []
     if not os.path.exists(folder_path):
         logging.warning(f"Directory not found: {folder_path}")
-        return docs
-        
-    for filename in os.listdir(folder_path):
-        filepath = os.path.join(folder_path, filename)
-        if os.path.isfile(filepath):
-            try:
-                with open(filepath, "r", encoding="utf-8") as f:
-                    content = f.read()
-                    metadata = {"source": os.path.join(os.path.basename(folder_path), filename)}
-                    docs.append(Document(page_content=content, metadata=metadata))
-            except Exception as e:
-                logging.error(f"Failed to read file {filepath}: {e}")
-    return docs
+        return []
+
+    # os.scandir carries the entry type, so no extra stat() per file; the context manager
+    # releases the directory handle as soon as the listing is done.
+    with os.scandir(folder_path) as it:
+        entries = [e for e in it if e.is_file()]
+    if not entries:
+        return []
+
+    folder_name = os.path.basename(folder_path)
+    with ThreadPoolExecutor(max_workers=min(FILE_READ_WORKERS, len(entries))) as executor:
+        docs = executor.map(lambda entry: _read_doc(entry, folder_name), entries)
+        return [doc for doc in docs if doc is not None]
 
 
 def load_combined_documents_for_department(dept):
@@ -81,10 +302,20 @@ def load_combined_documents_for_department(dept):
     dept_folder = os.path.join(UPLOAD_DIR, dept)
     general_folder = os.path.join(UPLOAD_DIR, "general")
     
-    dept_docs = _load_docs_from_folder(dept_folder)
-    general_docs = _load_docs_from_folder(general_folder)
+    # The two folders are independent, so load them concurrently.
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        dept_future = executor.submit(_load_docs_from_folder, dept_folder)
+        general_future = executor.submit(_load_docs_from_folder, general_folder)
+        dept_docs = dept_future.result()
+        general_docs = general_future.result()
     
-    combined_docs = dept_docs + general_docs
+    # Drop documents whose text is identical to one already loaded (e.g. a policy copied
+    # into both folders, or the 'general' department loading 'general' twice), keeping the first.
+    unique_docs = {}
+    for doc in dept_docs + general_docs:
+        digest = hashlib.blake2b(doc.page_content.encode("utf-8"), digest_size=16).digest()
+        unique_docs.setdefault(digest, doc)
+    combined_docs = list(unique_docs.values())
     
     logging.info(f"Total documents loaded: {len(combined_docs)}")
     if not combined_docs:
@@ -93,18 +324,167 @@ def load_combined_documents_for_department(dept):
     return combined_docs
 
 
+def _split_documents(docs):
+    """
+    Splits documents into retrieval chunks, then folds tiny chunks (typically the tail of a
+    section) into the preceding chunk of the same document. Fewer, fuller chunks mean fewer
+    embedding calls and no retrieval slots wasted on fragments.
+    """
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        separators=CHUNK_SEPARATORS,
+        length_function=len,
+        is_separator_regex=False,
+        add_start_index=True,
+    )
+    chunks = []
+    previous_end = None  # Offset in the source text where the last kept chunk ends.
+    for chunk in text_splitter.split_documents(docs):
+        # The offset is only needed for merging; keep it out of the stored metadata.
+        start = chunk.metadata.pop("start_index", -1)
+        end = start + len(chunk.page_content)
+        previous = chunks[-1] if chunks else None
+        if (previous is not None
+                and len(chunk.page_content) < MIN_CHUNK_SIZE
+                and previous.metadata == chunk.metadata
+                and start >= 0 and previous_end is not None):
+            # Drop exactly the characters the splitter repeated from the previous chunk. A chunk
+            # that continues where the previous one ends is appended as-is, restoring the source
+            # text; one that starts after a gap (stripped separators) goes on a new line.
+            if start <= previous_end:
+                tail = chunk.page_content[previous_end - start:]
+            else:
+                tail = "\n" + chunk.page_content
+            if not tail.strip():
+                previous_end = max(previous_end, end)
+                continue
+            if len(previous.page_content) + len(tail) <= MAX_CHUNK_SIZE:
+                previous.page_content += tail
+                previous_end = max(previous_end, end)
+                continue
+        chunks.append(chunk)
+        previous_end = end if start >= 0 else None
+    return chunks
+
+def _embed_in_batches(embedding, texts, batch_size=EMBED_BATCH_SIZE):
+    """
+    Embeds texts with one embed_documents request per batch of up to `batch_size`
+    texts, instead of relying on per-chunk calls, and returns the concatenated vectors.
+    """
+    vectors = []
+    for start in range(0, len(texts), batch_size):
+        vectors.extend(embedding.embed_documents(texts[start:start + batch_size]))
+    return vectors
+
+
+def _index_factory_string(num_vectors, dim):
+    """
+    Picks a FAISS index type for the corpus size. All options search sub-linearly,
+    unlike the flat index FAISS.from_embeddings builds by default; large corpora
+    additionally store product-quantized codes to cut memory footprint and scan bandwidth.
+    """
+    if num_vectors < IVF_MIN_VECTORS:
+        return "HNSW32"
+    nlist = max(64, min(int(4 * math.sqrt(num_vectors)), num_vectors // 39))
+    if num_vectors >= PQ_MIN_VECTORS and dim % PQ_SUBQUANTIZERS == 0:
+        return f"IVF{nlist},PQ{PQ_SUBQUANTIZERS}"
+    return f"IVF{nlist},Flat"
+
+def _tune_index(index):
+    """Applies search-time parameters (probe count / graph search breadth) and MMR support to an index."""
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+        return
+    try:
+        ivf = faiss.extract_index_ivf(index)
+    except RuntimeError:
+        # Not an IVF index (e.g. a flat index built by an older version); nothing to tune.
+        return
+    ivf.nprobe = IVF_NPROBE
+    # MMR retrieval re-reads candidate vectors via reconstruct(), which IVF only supports with a direct map.
+    ivf.make_direct_map()
+
+def _mmap_index(vector_path, loaded_index):
+    """
+    Re-opens a saved index memory-mapped and read-only, so its vector data stays in the
+    shared page cache instead of being held privately by each process.
+    IVF indexes map their inverted lists (IO_FLAG_MMAP); HNSW and flat indexes keep their
+    vectors in flat code arrays, which only IO_FLAG_MMAP_IFC maps. The two cannot be combined.
+    Falls back to the already-loaded index if the mapping fails.
+    """
+    try:
+        faiss.extract_index_ivf(loaded_index)
+        mmap_flag = faiss.IO_FLAG_MMAP
+    except RuntimeError:
+        mmap_flag = faiss.IO_FLAG_MMAP_IFC
+    try:
+        return faiss.read_index(
+            os.path.join(vector_path, "index.faiss"),
+            mmap_flag | faiss.IO_FLAG_READ_ONLY,
+        )
+    except RuntimeError as e:
+        logging.warning(f"Could not memory-map index at {vector_path}, keeping it in RAM. Error: {e}")
+        return loaded_index
+
+def _build_faiss_store(texts, vectors, metadatas, embedding):
+    """
+    Builds a LangChain FAISS store over precomputed vectors using the index type
+    chosen by _index_factory_string, training the index first when it needs it.
+    """
+    matrix = np.asarray(vectors, dtype="float32")
+    index = faiss.index_factory(matrix.shape[1], _index_factory_string(*matrix.shape))
+    if not index.is_trained:
+        index.train(matrix)
+    index.add(matrix)
+    _tune_index(index)
+
+    ids = [str(uuid.uuid4()) for _ in texts]
+    docstore = InMemoryDocstore({
+        doc_id: Document(page_content=text, metadata=metadata)
+        for doc_id, text, metadata in zip(ids, texts, metadatas)
+    })
+    return FAISS(
+        embedding_function=embedding,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=dict(enumerate(ids)),
+    )
+
+
 def create_or_load_vectorstore(dept):
+    """
+    Returns the department's vector store, loading or building it only on the first request.
+    Later calls are served from memory until clear_vectorstore_cache() is called.
+    """
+    vectordb = _VECTORSTORE_CACHE.get(dept)
+    if vectordb is not None:
+        return vectordb
+
+    with _VECTORSTORE_LOCKS.setdefault(dept, threading.Lock()):
+        # Another thread may have finished loading while we waited for the lock.
+        vectordb = _VECTORSTORE_CACHE.get(dept)
+        if vectordb is None:
+            vectordb = _load_or_build_vectorstore(dept)
+            if vectordb is not None:
+                _VECTORSTORE_CACHE[dept] = vectordb
+        return vectordb
+
+def _load_or_build_vectorstore(dept):
     """
     Creates or loads a vector store with improved error handling.
     """
     vector_path = os.path.join(VECTOR_DIR, dept)
-    embedding = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004")
+    embedding = _get_embedding_client()
 
     # Try to load an existing vector store
     if os.path.exists(vector_path):
         try:
             logging.info(f"Attempting to load existing vector store from: {vector_path}")
-            return FAISS.load_local(vector_path, embedding, allow_dangerous_deserialization=True)
+            vectordb = FAISS.load_local(vector_path, embedding, allow_dangerous_deserialization=True)
+            vectordb.index = _mmap_index(vector_path, vectordb.index)
+            _tune_index(vectordb.index)
+            return vectordb
         except Exception as e:
             logging.warning(f"Failed to load vector store from local. Error: {e}. It will be recreated.")
     
@@ -112,13 +492,15 @@ def create_or_load_vectorstore(dept):
     logging.info("Creating a new vector store...")
     docs = load_combined_documents_for_department(dept)
     if not docs:
-        # This will be handled in the get_answer_from_rag function
+        # Callers report this as NO_DOCUMENTS_MESSAGE
         return None 
 
     try:
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-        splitted_docs = text_splitter.split_documents(docs)
-        vectordb = FAISS.from_documents(splitted_docs, embedding)
+        splitted_docs = _split_documents(docs)
+        texts = [d.page_content for d in splitted_docs]
+        metadatas = [d.metadata for d in splitted_docs]
+        vectors = _embed_in_batches(embedding, texts)
+        vectordb = _build_faiss_store(texts, vectors, metadatas, embedding)
         vectordb.save_local(vector_path)
         logging.info(f"New vector store created and saved at: {vector_path}")
         return vectordb
@@ -126,52 +508,45 @@ def create_or_load_vectorstore(dept):
         logging.error(f"Failed while creating vector store: {e}")
         return None
 
-def get_answer_from_rag(dept, question, user_role):
+def _warm_up_clients():
     """
-    Gets a context-aware answer using the modern, recommended LangChain Expression Language (LCEL) chain.
-    This method correctly handles passing custom variables through the chain.
+    Creates the API clients and sends one throwaway query embedding, so the connection
+    handshake is already done when the first real question arrives.
+    """
+    try:
+        _get_embedding_client().embed_query("warm-up")
+        _get_question_answer_chain(get_current_model_from_config())
+    except Exception as e:
+        logging.warning(f"Client warm-up failed: {e}")
+
+def warm_up(dept):
+    """
+    Prepares everything the first question for a department needs, off the request path:
+    the department's vector store and the API clients, in parallel.
+    """
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        executor.submit(create_or_load_vectorstore, dept)
+        executor.submit(_warm_up_clients)
+
+def _build_retrieval_chain(dept):
+    """
+    Builds the LCEL retrieval chain for a department, or returns None if it has no documents.
     """
     vectordb = create_or_load_vectorstore(dept)
     if not vectordb:
-        return {"result": "Sorry, I couldn't find any documents for this department..."}
+        return None
 
-    retriever = vectordb.as_retriever(search_kwargs={"k": 5})
+    # MMR picks 3 diverse chunks out of the 10 nearest, so the prompt carries less
+    # redundant context than the plain top-5 similarity search did.
+    retriever = vectordb.as_retriever(
+        search_type="mmr",
+        search_kwargs={"k": RETRIEVER_K, "fetch_k": RETRIEVER_FETCH_K, "lambda_mult": RETRIEVER_LAMBDA_MULT}
+    )
     
     selected_model = get_current_model_from_config()
-    llm = ChatGoogleGenerativeAI(
-        model=selected_model,
-        temperature=0.2
-    )
 
-    prompt = ChatPromptTemplate.from_template(
-        """
-        You are a friendly and helpful onboarding assistant for the company "DummyWorX".
-        Your goal is to provide accurate, personalized, and conversational answers.
-
-        **IMPORTANT CONTEXT ABOUT THE USER ASKING THE QUESTION:**
-        - User's Role: {user_role}
-        - User's Department: {department}
-
-        Use the following pieces of retrieved context from the knowledge base to answer the user's question.
-
-        CONTEXT:
-        {context}
-
-        QUESTION:
-        {input}
-
-        INSTRUCTIONS:
-        - Answer the question from the perspective of the user's specific role.
-        - If the answer is in the context, provide it directly and confidently.
-        - If not, politely say you don't have information on that topic for their role and suggest they contact their manager.
-        - Always maintain a friendly, helpful, and professional tone.
-
-        FRIENDLY ANSWER:
-        """
-    )
-
-    # 1. Create a "stuff" chain: This chain knows how to combine the context and the question into a final prompt.
-    question_answer_chain = create_stuff_documents_chain(llm, prompt)
+    # 1. Get the "stuff" chain: This chain knows how to combine the context and the question into a final prompt.
+    question_answer_chain = _get_question_answer_chain(selected_model)
     
     # 2. Create the full retrieval chain: This chain knows how to:
     #    a) Take a question.
@@ -179,24 +554,40 @@ def get_answer_from_rag(dept, question, user_role):
     #    c) Pass the documents AND the original question (and any other variables) to the question_answer_chain.
     retrieval_chain = create_retrieval_chain(retriever, question_answer_chain)
 
-    try:
-        logging.info(f"Submitting question to RAG for user role '{user_role}': '{question}'")
-        
-        # We pass all the necessary variables in a single dictionary.
-        # The chain is smart enough to route them to the correct places.
-        response = retrieval_chain.invoke({
-            "input": question,
-            "user_role": user_role,
-            "department": dept
-        })
-        
-        # The new chain structure returns a dictionary with different keys.
-        # The final answer is in the 'answer' key. The retrieved docs are in 'context'.
-        return {
-            "result": response.get("answer", "Sorry, I couldn't formulate a response."),
-            "source_documents": response.get("context", [])
-        }
-        
-    except Exception as e:
-        logging.error(f"An error occurred while running the RAG chain: {e}")
-        return {"result": "Sorry, it seems there's a technical issue. Please try again later."}
\ No newline at end of file
+    return retrieval_chain
+
+def stream_answer_from_rag(dept, question, user_role):
+    """
+    Gets a context-aware answer through the LCEL retrieval chain, streamed so the UI can
+    show tokens as Gemini produces them.
+
+    Returns:
+        tuple: (chunks, source_documents). `chunks` is a generator of answer text fragments;
+        `source_documents` is a list that is filled with the retrieved documents as the stream runs.
+    """
+    source_documents = []
+    # Build (or load) the vector store and chain eagerly; only the generation itself is lazy.
+    retrieval_chain = _build_retrieval_chain(dept)
+
+    def generate():
+        if retrieval_chain is None:
+            yield NO_DOCUMENTS_MESSAGE
+            return
+        try:
+            logging.info(f"Streaming question to RAG for user role '{user_role}': '{question}'")
+            for chunk in retrieval_chain.stream({
+                "input": question,
+                "user_role": user_role,
+                "department": dept
+            }):
+                # The stream emits one key per chunk: the retrieved docs arrive under 'context',
+                # followed by the answer in pieces under 'answer'.
+                if "context" in chunk:
+                    source_documents.extend(chunk["context"])
+                if chunk.get("answer"):
+                    yield chunk["answer"]
+        except Exception as e:
+            logging.error(f"An error occurred while streaming the RAG chain: {e}")
+            yield TECHNICAL_ISSUE_MESSAGE
+
+    return generate(), source_documents
@@ -1,5 +1,6 @@
 # src/main.py
 
+import threading
 import streamlit as st
 from datetime import datetime
 from zoneinfo import ZoneInfo
@@ -9,6 +10,7 @@ import config
 from auth.authenticator import check_authentication, get_user_role, logout
 from components.admin_panel import show_admin_panel
 from components.chat_ui import show_chat_ui
+from core.rag_engine import warm_up
 
 TARGET_TIMEZONE = ZoneInfo("Asia/Jakarta")
 
@@ -29,11 +31,18 @@ if "username" not in st.session_state:
 if "department" not in st.session_state:
     st.session_state.department = "general"
 
+# --- Knowledge Base Warm-up ---
+# Load (or build) the user's vector store and open the API connections in the background
+# while the page renders, so the first question doesn't wait for either. Once per session.
+if st.session_state.role != "admin" and not st.session_state.get("vectorstore_warmed"):
+    threading.Thread(target=warm_up, args=(st.session_state.department,), daemon=True).start()
+    st.session_state.vectorstore_warmed = True
+
 # --- Sidebar (The App's "Frame") ---
 with st.sidebar:
     st.image(config.LOGO_PATH, width=200)
     st.title(f"Hello, {st.session_state.username}!")
-    st.markdown(f"**Role:** {st.session_state.role.title()}")
+    st.markdown(f"**Role:** {st.session_state.get('role_title') or st.session_state.role.title()}")
     st.markdown(f"**Department:** {st.session_state.department.title()}")
     st.button("Logout", on_click=logout)
 